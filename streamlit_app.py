@@ -1,12 +1,26 @@
 # streamlit_app.py - FIXED VERSION FOR BACKEND COMPATIBILITY
 import os
+import logging
+import http.cookiejar
 import streamlit as st
 import requests
 import pandas as pd
 import json
 from dotenv import load_dotenv
 import time
+import threading
 import urllib3
+from pathlib import Path
+from requests.adapters import HTTPAdapter
+from requests_toolbelt.multipart.encoder import MultipartEncoder
+from urllib3.util.retry import Retry
+from streamlit.runtime.scriptrunner import add_script_run_ctx
+
+# Optional faster JSON backend; falls back to the stdlib json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Disable SSL warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -14,6 +28,11 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 # Load environment variables
 load_dotenv()
 
+# Debug logging is opt-in via APP_DEBUG
+logger = logging.getLogger(__name__)
+if os.getenv("APP_DEBUG"):
+    logging.basicConfig(level=logging.DEBUG)
+
 # Page configuration
 st.set_page_config(
     page_title="AI-Powered Financial Reconciliation Tool", 
@@ -22,28 +41,12 @@ st.set_page_config(
 )
 
 # Custom CSS for better styling
-st.markdown("""
-<style>
-    .stSuccess {
-        background-color: #d4edda;
-        border: 1px solid #c3e6cb;
-        border-radius: 0.375rem;
-        padding: 0.75rem 1.25rem;
-    }
-    .stError {
-        background-color: #f8d7da;
-        border: 1px solid #f5c6cb;
-        border-radius: 0.375rem;
-        padding: 0.75rem 1.25rem;
-    }
-    .metric-card {
-        background-color: #f8f9fa;
-        padding: 1rem;
-        border-radius: 0.5rem;
-        border: 1px solid #e9ecef;
-    }
-</style>
-""", unsafe_allow_html=True)
+@st.cache_resource
+def _load_css():
+    """Read the stylesheet once per process"""
+    return (Path(__file__).parent / "assets" / "styles.css").read_text()
+
+st.markdown(f"<style>{_load_css()}</style>", unsafe_allow_html=True)
 
 st.title("🏦 AI-Powered Financial Reconciliation Tool")
 st.write("Upload your bank statement and invoice files to automatically match transactions using AI.")
@@ -51,6 +54,8 @@ st.write("Upload your bank statement and invoice files to automatically match tr
 # Configuration - FIXED: Use production URL as default
 BACKEND_URL = os.getenv("FLASK_BACKEND_URL", "https://financial-reconciliation-app.onrender.com")
 REQUEST_TIMEOUT = 300  # 5 minutes timeout for long operations
+PREVIEW_ROWS = 5  # Rows shown in preprocessing sample previews
+SMALL_TABLE_ROWS = 20  # Unmatched lists up to this size render as static tables
 
 # Debug info (remove in production)
 if st.sidebar.checkbox("Show Debug Info"):
@@ -68,7 +73,10 @@ def initialize_session_state():
         'files_uploaded': False,
         'columns_identified': False,
         'matching_completed': False,
-        'backend_status': None
+        'backend_status': None,
+        'backend_probe': None,
+        'bank_file_valid': None,
+        'invoice_file_valid': None
     }
     
     for key, default_value in default_states.items():
@@ -78,56 +86,94 @@ def initialize_session_state():
 initialize_session_state()
 
 # --- Helper Functions ---
-def test_backend_connection():
-    """Test connection to backend server with improved retry logic"""
-    max_retries = 3
-    base_delay = 2
-    
-    for attempt in range(max_retries):
+@st.cache_resource
+def get_session():
+    """Shared HTTP session so backend calls reuse pooled keep-alive connections"""
+    session = requests.Session()
+    # The session is shared by every user of the process, so never persist cookies
+    # from the backend or proxy; the backend tracks state via session_id in the body
+    session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    # Retry transient gateway errors (e.g. Render cold starts) with exponential backoff
+    retries = Retry(
+        total=3,
+        backoff_factor=2,
+        status_forcelist=[502, 503, 504],
+        raise_on_status=False  # Hand back the last response instead of raising
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def test_backend_connection_impl(backend_url):
+    """Test connection to backend server (retries are handled by the session adapter)"""
+    try:
+        # Longer timeout for Render cold starts
+        response = get_session().get(
+            f"{backend_url}/health", 
+            timeout=45,  # Increased timeout for cold starts
+            verify=True,
+            stream=True,  # Defer the body so error pages are only partially read
+            headers={
+                'User-Agent': 'Streamlit-Financial-App/1.0',
+                'Accept': 'application/json'
+            }
+        )
+        
         try:
-            # Longer timeout for Render cold starts
-            response = requests.get(
-                f"{BACKEND_URL}/health", 
-                timeout=45,  # Increased timeout for cold starts
-                verify=True,
-                headers={
-                    'User-Agent': 'Streamlit-Financial-App/1.0',
-                    'Accept': 'application/json'
-                }
-            )
-            
             if response.status_code == 200:
+                # Drain the small health payload so the connection goes back to the pool
+                _ = response.content
                 return True, f"Connected (HTTP {response.status_code})"
             else:
-                return False, f"HTTP {response.status_code}: {response.text[:100]}"
-                
-        except requests.exceptions.SSLError as e:
-            error_msg = f"SSL Error: {str(e)[:100]}"
-            if attempt == max_retries - 1:
-                return False, error_msg
-                
-        except requests.exceptions.ConnectionError as e:
-            error_msg = f"Connection Error: {str(e)[:100]}"
-            if attempt == max_retries - 1:
-                return False, error_msg
-                
-        except requests.exceptions.Timeout:
-            error_msg = f"Timeout after 45s (attempt {attempt + 1}/{max_retries})"
-            if attempt == max_retries - 1:
-                return False, "Timeout - Backend may be sleeping on Render"
-                
-        except Exception as e:
-            error_msg = f"Unexpected error: {str(e)[:100]}"
-            if attempt == max_retries - 1:
-                return False, error_msg
+                snippet = next(response.iter_content(256), b'').decode('utf-8', 'replace')
+                return False, f"HTTP {response.status_code}: {snippet[:100]}"
+        finally:
+            response.close()
+            
+    except requests.exceptions.SSLError as e:
+        return False, f"SSL Error: {str(e)[:100]}"
+        
+    except requests.exceptions.ConnectionError as e:
+        return False, f"Connection Error: {str(e)[:100]}"
         
-        # Wait before retry with exponential backoff
-        if attempt < max_retries - 1:
-            delay = base_delay * (2 ** attempt)
-            st.info(f"Retrying in {delay} seconds... (attempt {attempt + 1}/{max_retries})")
-            time.sleep(delay)
+    except requests.exceptions.Timeout:
+        return False, "Timeout - Backend may be sleeping on Render"
+        
+    except Exception as e:
+        return False, f"Unexpected error: {str(e)[:100]}"
+
+class _HealthCheckFailed(Exception):
+    """Raised by _cached_health so failed probes are not cached"""
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _cached_health(backend_url):
+    """Cache successful health probes per backend URL so reruns don't re-probe"""
+    is_connected, status = test_backend_connection_impl(backend_url)
+    if not is_connected:
+        # Streamlit does not cache raised exceptions, so the next check probes again
+        raise _HealthCheckFailed(status)
+    return is_connected, status
+
+def test_backend_connection():
+    """Test connection to backend server (successes are cached for a short period)"""
+    try:
+        return _cached_health(BACKEND_URL)
+    except _HealthCheckFailed as e:
+        return False, str(e)
+
+def start_backend_probe():
+    """Run the health probe in a background thread and return its result holder"""
+    # The thread only writes to this plain dict; session state is updated on a later rerun
+    probe = {'result': None}
+    
+    def run():
+        probe['result'] = test_backend_connection()
     
-    return False, "Max retries exceeded"
+    thread = threading.Thread(target=run, daemon=True)
+    add_script_run_ctx(thread)
+    thread.start()
+    return probe
 
 def validate_file(file, file_type):
     """Validate uploaded file"""
@@ -146,18 +192,38 @@ def validate_file(file, file_type):
     
     return True, "Valid"
 
+def get_file_validation(file, file_type, state_key):
+    """Validate an uploaded file once and reuse the result until a different file is uploaded"""
+    if file is None:
+        return validate_file(file, file_type)
+    
+    cached = st.session_state.get(state_key)
+    if cached and cached['file_id'] == file.file_id:
+        return cached['result']
+    
+    result = validate_file(file, file_type)
+    st.session_state[state_key] = {'file_id': file.file_id, 'result': result}
+    return result
+
 def make_api_request(endpoint, method="GET", data=None, files=None):
     """Make API request with proper error handling"""
     try:
         url = f"{BACKEND_URL}{endpoint}"
-        print(f"DEBUG: Making {method} request to: {url}")
+        logger.debug("Making %s request to: %s", method, url)
         
         if method == "GET":
-            response = requests.get(url, timeout=REQUEST_TIMEOUT)
+            response = get_session().get(url, timeout=REQUEST_TIMEOUT)
         elif method == "POST" and files:
-            response = requests.post(url, files=files, timeout=REQUEST_TIMEOUT)
+            # Stream the multipart body from the file objects instead of building it in memory
+            encoder = MultipartEncoder(fields=files)
+            response = get_session().post(
+                url,
+                data=encoder,
+                headers={'Content-Type': encoder.content_type},
+                timeout=REQUEST_TIMEOUT
+            )
         elif method == "POST" and data:
-            response = requests.post(
+            response = get_session().post(
                 url, 
                 json=data, 
                 headers={'Content-Type': 'application/json'},
@@ -175,6 +241,38 @@ def make_api_request(endpoint, method="GET", data=None, files=None):
     except Exception as e:
         return None, f"Request failed: {str(e)}"
 
+def _records_df(records):
+    """Build a display DataFrame from a list of backend records"""
+    # Backend rows share one schema, so take the columns from the first row
+    # rather than letting pandas union the keys of every row
+    columns = list(records[0].keys()) if records else []
+    return pd.DataFrame.from_records(records, columns=columns)
+
+def parse_json_response(response):
+    """Decode a JSON response body, using orjson when available"""
+    if orjson is not None:
+        try:
+            return orjson.loads(response.content)
+        except orjson.JSONDecodeError:
+            # orjson is strict RFC 8259 and rejects the NaN/Infinity tokens
+            # Flask emits for missing pandas values; stdlib json accepts them
+            pass
+    return response.json()
+
+def dump_json_report(data):
+    """Serialize a report to indented JSON, using orjson when available"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                data,
+                default=str,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            ).decode()
+        except TypeError:
+            # e.g. integers wider than 64 bits, which default=str does not cover
+            pass
+    return json.dumps(data, indent=2, default=str)
+
 def display_preprocessing_summary(result):
     """Display preprocessing summary in a structured format"""
     st.subheader("📊 Preprocessing Summary")
@@ -185,22 +283,19 @@ def display_preprocessing_summary(result):
         st.markdown("#### Bank Statement (Processed)")
         info = result['preprocessing_info']
         
-        # Display metrics in a card-like format
-        st.markdown(f"""
-        <div class="metric-card">
-            <strong>Original rows:</strong> {info['bank_original_rows']}<br>
-            <strong>Processed rows:</strong> {info['bank_processed_rows']}<br>
-            <strong>Rows removed:</strong> {info['bank_original_rows'] - info['bank_processed_rows']}<br>
-            <strong>Sensitive columns detected:</strong> {len(info.get('bank_sensitive_columns', []))}
-        </div>
-        """, unsafe_allow_html=True)
+        # Display metrics with native widgets
+        m1, m2 = st.columns(2)
+        m1.metric("Original rows", info['bank_original_rows'])
+        m2.metric("Processed rows", info['bank_processed_rows'])
+        m1.metric("Rows removed", info['bank_original_rows'] - info['bank_processed_rows'])
+        m2.metric("Sensitive columns detected", len(info.get('bank_sensitive_columns', [])))
         
         if info.get('bank_sensitive_columns'):
             st.write("**Encrypted columns:**", ", ".join(info['bank_sensitive_columns']))
         #st.write(result)
-        st.write("**Sample Processed Data (first 5 rows):**")
+        st.write(f"**Sample Processed Data (first {PREVIEW_ROWS} rows):**")
         if result['bank_statement_sample']:
-            df_display = pd.DataFrame(result['bank_statement_sample']).head()
+            df_display = _records_df(result['bank_statement_sample'][:PREVIEW_ROWS])
             st.dataframe(df_display, use_container_width=True)
         else:
             st.info("No bank statement data after preprocessing.")
@@ -208,22 +303,19 @@ def display_preprocessing_summary(result):
     with col2_info:
         st.markdown("#### Invoices (Processed)")
         
-        # Display metrics in a card-like format
-        st.markdown(f"""
-        <div class="metric-card">
-            <strong>Original rows:</strong> {info['invoice_original_rows']}<br>
-            <strong>Processed rows:</strong> {info['invoice_processed_rows']}<br>
-            <strong>Rows removed:</strong> {info['invoice_original_rows'] - info['invoice_processed_rows']}<br>
-            <strong>Sensitive columns detected:</strong> {len(info.get('invoice_sensitive_columns', []))}
-        </div>
-        """, unsafe_allow_html=True)
+        # Display metrics with native widgets
+        m1, m2 = st.columns(2)
+        m1.metric("Original rows", info['invoice_original_rows'])
+        m2.metric("Processed rows", info['invoice_processed_rows'])
+        m1.metric("Rows removed", info['invoice_original_rows'] - info['invoice_processed_rows'])
+        m2.metric("Sensitive columns detected", len(info.get('invoice_sensitive_columns', [])))
         
         if info.get('invoice_sensitive_columns'):
             st.write("**Encrypted columns:**", ", ".join(info['invoice_sensitive_columns']))
         
-        st.write("**Sample Processed Data (first 5 rows):**")
+        st.write(f"**Sample Processed Data (first {PREVIEW_ROWS} rows):**")
         if result['invoices_sample']:
-            df_display = pd.DataFrame(result['invoices_sample']).head()
+            df_display = _records_df(result['invoices_sample'][:PREVIEW_ROWS])
             st.dataframe(df_display, use_container_width=True)
         else:
             st.info("No invoice data after preprocessing.")
@@ -263,9 +355,53 @@ def display_column_identification(result):
     st.markdown("#### Matching Strategy")
     st.info(col_info['matching_strategy'])
 
+def _build_matched_df(matches):
+    """Flatten matched pairs into a single DataFrame with Bank_/Invoice_ prefixed columns"""
+    bank_df = pd.DataFrame.from_records([m['file_a_entry'] for m in matches]).add_prefix('Bank_')
+    invoice_df = pd.DataFrame.from_records([m['file_b_entry'] for m in matches]).add_prefix('Invoice_')
+    meta_df = pd.DataFrame({
+        'Confidence_Score': [m['confidence_score'] for m in matches],
+        'Match_Reason': [m['match_reason'] for m in matches]
+    })
+    return pd.concat([bank_df, invoice_df, meta_df], axis=1)
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _matched_df(session_id, _matches):
+    """Cached matched-transactions DataFrame shared by the display and download paths"""
+    return _build_matched_df(_matches)
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def matched_csv(session_id, _matches):
+    """Serialize matched transactions to CSV once per session"""
+    # Leading underscore tells Streamlit not to hash the (large) matches list;
+    # the backend session_id already identifies a single matching result
+    return _matched_df(session_id, _matches).to_csv(index=False).encode()
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def report_json(session_id, _matching_result):
+    """Serialize the comprehensive reconciliation report once per session"""
+    report_data = {
+        'summary': _matching_result.get('summary', {}),
+        'matches': _matching_result.get('matches', []),
+        'unmatched_bank': _matching_result.get('unmatched_file_a_entries', []),
+        'unmatched_invoices': _matching_result.get('unmatched_file_b_entries', []),
+        'column_info': _matching_result.get('column_info', {})
+    }
+    return dump_json_report(report_data)
+
+def display_records(records):
+    """Render a list of records, using a static table instead of the interactive grid for small lists"""
+    # Both paths share _records_df so columns don't change when crossing SMALL_TABLE_ROWS
+    records_df = _records_df(records)
+    if len(records) <= SMALL_TABLE_ROWS:
+        st.table(records_df)
+    else:
+        st.dataframe(records_df, use_container_width=True)
+
 def display_matching_results(result):
     """Display matching results in a structured format"""
     st.subheader("📊 Reconciliation Results")
+    session_id = st.session_state['session_id']
     
     # Summary metrics
     summary = result.get('summary', {})
@@ -286,45 +422,35 @@ def display_matching_results(result):
     # Display detailed results
     if result.get('matches'):
         with st.expander("✅ Matched Transactions", expanded=True):
-            matched_data = []
-            for match in result['matches']:
-                # Flatten the match data for display
-                row = {}
-                # Add bank data with prefix
-                for key, value in match['file_a_entry'].items():
-                    row[f"Bank_{key}"] = value
-                # Add invoice data with prefix
-                for key, value in match['file_b_entry'].items():
-                    row[f"Invoice_{key}"] = value
-                # Add match metadata
-                row['Confidence_Score'] = match['confidence_score']
-                row['Match_Reason'] = match['match_reason']
-                matched_data.append(row)
-            
-            if matched_data:
-                matched_df = pd.DataFrame(matched_data)
-                st.dataframe(matched_df, use_container_width=True)
+            matched_df = _matched_df(session_id, result['matches'])
+            st.dataframe(matched_df, use_container_width=True)
     
     if result.get('unmatched_file_a_entries'):
         with st.expander("⚠️ Unmatched Bank Transactions"):
-            unmatched_bank_df = pd.DataFrame(result['unmatched_file_a_entries'])
-            st.dataframe(unmatched_bank_df, use_container_width=True)
+            display_records(result['unmatched_file_a_entries'])
     
     if result.get('unmatched_file_b_entries'):
         with st.expander("⚠️ Unmatched Invoices"):
-            unmatched_invoice_df = pd.DataFrame(result['unmatched_file_b_entries'])
-            st.dataframe(unmatched_invoice_df, use_container_width=True)
+            display_records(result['unmatched_file_b_entries'])
 
 # --- Main Application ---
 
 # Backend Status Check
+# The probe runs in the background so the page renders immediately on Render cold starts
 if st.session_state.backend_status is None:
-    with st.spinner("Checking backend status..."):
-        is_connected, status = test_backend_connection()
+    if st.session_state.backend_probe is None:
+        st.session_state.backend_probe = start_backend_probe()
+    if st.session_state.backend_probe['result'] is not None:
+        is_connected, status = st.session_state.backend_probe['result']
         st.session_state.backend_status = {"connected": is_connected, "message": status}
+        st.session_state.backend_probe = None
+
+backend_connected = bool(st.session_state.backend_status and st.session_state.backend_status["connected"])
 
 # Display connection status
-if st.session_state.backend_status["connected"]:
+if st.session_state.backend_status is None:
+    st.info("⏳ Checking backend status... This will update on your next interaction.")
+elif backend_connected:
     st.success(f"✅ Backend connected: {st.session_state.backend_status['message']}")
 else:
     st.error(f"❌ Backend connection failed: {st.session_state.backend_status['message']}")
@@ -345,7 +471,7 @@ with col1:
         help="Supported formats: CSV, Excel (.xlsx, .xls). Max size: 50MB"
     )
     if bank_file:
-        is_valid, message = validate_file(bank_file, "Bank statement")
+        is_valid, message = get_file_validation(bank_file, "Bank statement", 'bank_file_valid')
         if is_valid:
             st.success(f"✅ Bank statement loaded: **{bank_file.name}** ({bank_file.size:,} bytes)")
         else:
@@ -360,31 +486,34 @@ with col2:
         help="Supported formats: CSV, Excel (.xlsx, .xls). Max size: 50MB"
     )
     if invoice_file:
-        is_valid, message = validate_file(invoice_file, "Invoice")
+        is_valid, message = get_file_validation(invoice_file, "Invoice", 'invoice_file_valid')
         if is_valid:
             st.success(f"✅ Invoices loaded: **{invoice_file.name}** ({invoice_file.size:,} bytes)")
         else:
             st.error(f"❌ {message}")
 
 # Process files button
-upload_disabled = st.session_state.get('files_uploaded', False) or not st.session_state.backend_status["connected"]
+upload_disabled = st.session_state.get('files_uploaded', False) or not backend_connected
 
 if st.button("🚀 Upload & Prepare Data", type="primary", disabled=upload_disabled):
     # Check for duplicate file names
     if bank_file and invoice_file and bank_file.name == invoice_file.name:
         st.error("❌ Both files have same name")
     else:
-        # Validate files
-        bank_valid, bank_msg = validate_file(bank_file, "Bank statement") if bank_file else (False, "Bank statement file is required")
-        invoice_valid, invoice_msg = validate_file(invoice_file, "Invoice") if invoice_file else (False, "Invoice file is required")
+        # Reuse the validation results recorded when the files were uploaded
+        bank_valid, bank_msg = get_file_validation(bank_file, "Bank statement", 'bank_file_valid')
+        invoice_valid, invoice_msg = get_file_validation(invoice_file, "Invoice", 'invoice_file_valid')
         
         if not bank_valid or not invoice_valid:
             st.error(f"❌ Please fix the following issues:\n- {bank_msg if not bank_valid else ''}\n- {invoice_msg if not invoice_valid else ''}")
         else:
             with st.spinner("Uploading, parsing, and preprocessing files... This may take a moment."):
+                # Pass the uploaded file objects so the multipart encoder reads them in chunks
+                bank_file.seek(0)
+                invoice_file.seek(0)
                 files = {
-                    'bank_statement': (bank_file.name, bank_file.getvalue(), bank_file.type),
-                    'invoices': (invoice_file.name, invoice_file.getvalue(), invoice_file.type)
+                    'bank_statement': (bank_file.name, bank_file, bank_file.type),
+                    'invoices': (invoice_file.name, invoice_file, invoice_file.type)
                 }
 
                 response, error = make_api_request("/upload", method="POST", files=files)
@@ -392,7 +521,7 @@ if st.button("🚀 Upload & Prepare Data", type="primary", disabled=upload_disab
                 if error:
                     st.error(f"❌ Upload failed: {error}")
                 elif response and response.status_code == 200:
-                    result = response.json()
+                    result = parse_json_response(response)
                     if result.get('success'):
                         st.success("✅ Files uploaded and preprocessed successfully!")
                         st.session_state['upload_result'] = result
@@ -409,7 +538,7 @@ if st.session_state.get('upload_result') and st.session_state.get('session_id'):
     st.header("🔍 Step 2: AI Column Identification")
     st.write("Let AI identify the key columns for transaction matching.")
     column_disabled = (st.session_state.get('columns_identified', False) or 
-                      not st.session_state.backend_status["connected"])
+                      not backend_connected)
     if st.button("🤖 Identify Key Columns", type="secondary", disabled=column_disabled):
         with st.spinner("AI is analyzing your data to identify key matching columns..."):
             column_payload = {
@@ -417,11 +546,10 @@ if st.session_state.get('upload_result') and st.session_state.get('session_id'):
             }
 
             response, error = make_api_request("/identify_columns", method="POST", data=column_payload)
-            st.write(response,error)
             if error:
                 st.error(f"❌ Column identification failed: {error}")
             elif response and response.status_code == 200:
-                result = response.json()
+                result = parse_json_response(response)
                 if result.get('success'):
                     st.success("✅ Key columns identified successfully!")
                     st.session_state['column_identification_result'] = result
@@ -438,7 +566,7 @@ if st.session_state.get('column_identification_result') and st.session_state.get
     st.write("Start the AI reconciliation process using the identified columns.")
 
     matching_disabled = (st.session_state.get('matching_completed', False) or 
-                        not st.session_state.backend_status["connected"])
+                        not backend_connected)
 
     if st.button("🚀 Start AI Matching", type="secondary", disabled=matching_disabled):
         with st.spinner("Performing AI matching... This may take a while for large datasets."):
@@ -451,7 +579,7 @@ if st.session_state.get('column_identification_result') and st.session_state.get
             if error:
                 st.error(f"❌ Matching failed: {error}")
             elif response and response.status_code == 200:
-                result = response.json()
+                result = parse_json_response(response)
                 if result.get('success'):
                     st.success("✅ AI Matching completed!")
                     st.session_state['matching_result'] = result
@@ -468,52 +596,23 @@ if st.session_state.get('matching_result'):
     col1, col2 = st.columns(2)
     
     with col1:
-        if st.button("📊 Download Matched Transactions"):
-            if st.session_state['matching_result'].get('matches'):
-                # Prepare matched data for download
-                matched_data = []
-                for match in st.session_state['matching_result']['matches']:
-                    row = {}
-                    # Add bank data with prefix
-                    for key, value in match['file_a_entry'].items():
-                        row[f"Bank_{key}"] = value
-                    # Add invoice data with prefix
-                    for key, value in match['file_b_entry'].items():
-                        row[f"Invoice_{key}"] = value
-                    # Add match metadata
-                    row['Confidence_Score'] = match['confidence_score']
-                    row['Match_Reason'] = match['match_reason']
-                    matched_data.append(row)
-                
-                matched_df = pd.DataFrame(matched_data)
-                csv = matched_df.to_csv(index=False)
-                st.download_button(
-                    label="Download Matched Transactions CSV",
-                    data=csv,
-                    file_name=f"matched_transactions_{int(time.time())}.csv",
-                    mime="text/csv"
-                )
-            else:
-                st.info("No matches to download")
-    
-    with col2:
-        if st.button("📋 Download Full Report"):
-            # Create a comprehensive report
-            report_data = {
-                'summary': st.session_state['matching_result'].get('summary', {}),
-                'matches': st.session_state['matching_result'].get('matches', []),
-                'unmatched_bank': st.session_state['matching_result'].get('unmatched_file_a_entries', []),
-                'unmatched_invoices': st.session_state['matching_result'].get('unmatched_file_b_entries', []),
-                'column_info': st.session_state['matching_result'].get('column_info', {})
-            }
-            
-            json_report = json.dumps(report_data, indent=2, default=str)
+        if st.session_state['matching_result'].get('matches'):
             st.download_button(
-                label="Download JSON Report",
-                data=json_report,
-                file_name=f"reconciliation_report_{int(time.time())}.json",
-                mime="application/json"
+                label="📊 Download Matched Transactions",
+                data=matched_csv(st.session_state['session_id'], st.session_state['matching_result']['matches']),
+                file_name=f"matched_transactions_{int(time.time())}.csv",
+                mime="text/csv"
             )
+        else:
+            st.info("No matches to download")
+    
+    with col2:
+        st.download_button(
+            label="📋 Download Full Report",
+            data=report_json(st.session_state['session_id'], st.session_state['matching_result']),
+            file_name=f"reconciliation_report_{int(time.time())}.json",
+            mime="application/json"
+        )
 
 # Reset functionality
 if (st.session_state.get('files_uploaded') or 
@@ -521,9 +620,11 @@ if (st.session_state.get('files_uploaded') or
     st.session_state.get('matching_completed')):
     st.header("🔄 Reset")
     if st.button("🗑️ Clear All Data and Start Over", type="secondary"):
-        # Clear all session state
+        # Clear all session state except the backend health check, which is
+        # still valid and would otherwise disable every action until the next rerun
         for key in list(st.session_state.keys()):
-            del st.session_state[key]
+            if key not in ('backend_status', 'backend_probe'):
+                del st.session_state[key]
         st.rerun()
 
 # --- Sidebar ---
@@ -534,6 +635,8 @@ with st.sidebar:
     st.write("**Backend Connection:**")
     if st.button("Test Connection", key="test_connection"):
         with st.spinner("Testing connection..."):
+            # Force a live re-check on explicit user action
+            _cached_health.clear()
             is_connected, status = test_backend_connection()
             st.session_state.backend_status = {"connected": is_connected, "message": status}
             if is_connected:
@@ -563,8 +666,8 @@ with st.sidebar:
     # Session info
     if st.session_state.get('session_id'):
         st.markdown("---")
-        st.subheader("🗂️ Session Info")
-        st.write(f"**Session ID:** `{st.session_state['session_id'][:20]}...`")
+        with st.expander("🗂️ Session Info", expanded=False):
+            st.write(f"**Session ID:** `{st.session_state['session_id'][:20]}...`")
     
     # Configuration info
     st.markdown("---")